@@ -3,37 +3,137 @@ Azure Function pour le système de recommandation My Content
 Expose une API HTTP pour générer des recommandations d'articles
 """
 
+import asyncio
 import azure.functions as func
+import functools
 import logging
 import json
 import pickle
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from azure.storage.blob import BlobServiceClient
+from azure.storage.blob.aio import BlobServiceClient
 import os
 from io import BytesIO
 
+try:
+    import faiss
+except ImportError:
+    # FAISS est optionnel: sans lui on retombe sur un produit scalaire numpy
+    faiss = None
+
+try:
+    import numba
+except ImportError:
+    # Numba est un accélérateur optionnel du chemin de repli sans FAISS
+    numba = None
+
+try:
+    import orjson
+except ImportError:
+    # orjson est optionnel: repli sur le json de la bibliothèque standard
+    orjson = None
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _dot_scores(queries, embeddings):
+        """
+        Produit scalaire (n_requêtes, N) sur des embeddings pré-normalisés:
+        équivaut à la similarité cosinus sans re-normalisation.
+        """
+        n_queries, dim = queries.shape
+        n_articles = embeddings.shape[0]
+        out = np.empty((n_queries, n_articles), dtype=np.float32)
+        for q in range(n_queries):
+            for i in numba.prange(n_articles):
+                score = 0.0
+                for j in range(dim):
+                    score += queries[q, j] * embeddings[i, j]
+                out[q, i] = score
+        return out
+else:
+    _dot_scores = None
+
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 
+# Dtypes explicites des colonnes de clicks: évite la passe d'inférence
+# de types du parser CSV et produit directement des colonnes compactes
+_CLICK_DTYPES = {
+    'user_id': 'int32',
+    'click_article_id': 'int32',
+    'click_timestamp': 'int64',
+}
+
+
+def _read_clicks_csv(click_bytes):
+    """
+    Parse un CSV de clicks avec dtypes explicites, via le parser C++
+    parallèle de pyarrow quand il est disponible.
+    """
+    try:
+        return pd.read_csv(BytesIO(click_bytes), engine='pyarrow', dtype=_CLICK_DTYPES)
+    except (ImportError, TypeError, ValueError):
+        return pd.read_csv(BytesIO(click_bytes), dtype=_CLICK_DTYPES)
+
+
+def _json_response(payload, status_code=200):
+    """
+    Sérialise la réponse en JSON. orjson (Rust) est nettement plus rapide
+    que json et gère nativement les scalaires numpy; HttpResponse accepte
+    directement les bytes qu'il retourne.
+    """
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False)
+
+    return func.HttpResponse(
+        body,
+        mimetype="application/json",
+        status_code=status_code
+    )
+
 # Variables globales pour mettre en cache les données
 _embeddings = None
 _article_ids = None
 _articles_metadata = None
 _user_clicks = None
+_index = None
+_id_to_idx = None
+_history_by_user = None
+_meta_by_id = None
+_category_by_idx = None
+_words_count_by_idx = None
+
+# Verrou de chargement: sur un cold start, plusieurs requêtes concurrentes
+# ne doivent déclencher qu'un seul chargement des données
+_load_lock = asyncio.Lock()
 
-def load_data_from_blob():
+async def load_data_from_blob():
     """
     Charge les données depuis Azure Blob Storage.
     Utilise un cache global pour éviter de recharger à chaque requête.
+    Asynchrone: les téléchargements se recouvrent et le worker peut
+    servir d'autres requêtes pendant un cold start.
     """
-    global _embeddings, _article_ids, _articles_metadata, _user_clicks
-    
     # Si déjà chargé, retourner les données en cache
     if _embeddings is not None:
         logging.info("Utilisation des données en cache")
         return
-    
+
+    async with _load_lock:
+        # Revérifier sous le verrou: une autre requête a pu terminer le
+        # chargement pendant l'attente
+        if _embeddings is not None:
+            logging.info("Utilisation des données en cache")
+            return
+        await _do_load_data()
+
+
+async def _do_load_data():
+    """Chargement effectif des données (appelé sous _load_lock)."""
+    global _embeddings, _article_ids, _articles_metadata, _user_clicks, _index, _id_to_idx
+    global _history_by_user, _meta_by_id
+
     logging.info("Chargement des données depuis Blob Storage...")
     
     try:
@@ -43,155 +143,475 @@ def load_data_from_blob():
         if not connect_str:
             raise ValueError("AzureWebJobsStorage connection string non trouvée")
         
-        blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-        container_client = blob_service_client.get_container_client("data")
-        
-        # 1. Charger les embeddings
-        logging.info("Chargement des embeddings...")
-        blob_client = container_client.get_blob_client("articles_embeddings.pickle")
-        embeddings_data = pickle.loads(blob_client.download_blob().readall())
-        
-        # Les embeddings sont un array numpy
-        _embeddings = embeddings_data
-        
-        # 2. Charger les métadonnées pour obtenir les article_ids
-        logging.info("Chargement des métadonnées...")
-        blob_client = container_client.get_blob_client("articles_metadata.csv")
-        metadata_bytes = blob_client.download_blob().readall()
-        _articles_metadata = pd.read_csv(BytesIO(metadata_bytes))
-        
-        # Mapper les embeddings aux article_ids
-        _article_ids = _articles_metadata['article_id'].iloc[:len(_embeddings)].tolist()
-        
-        logging.info(f"✓ {len(_article_ids)} embeddings chargés")
-        
-        # 3. Charger quelques fichiers de clicks
-        logging.info("Chargement des clicks...")
-        all_clicks = []
-        
-        # Liste des blobs dans le dossier clicks/
-        blob_list = container_client.list_blobs(name_starts_with="clicks/")
-        click_files = [blob.name for blob in blob_list if blob.name.endswith('.csv')][:10]
-        
-        if not click_files:
-            # Si pas de dossier clicks/, chercher les fichiers à la racine
-            blob_list = container_client.list_blobs()
-            click_files = [blob.name for blob in blob_list if 'clicks_hour' in blob.name][:10]
-        
-        for blob_name in click_files:
-            try:
-                blob_client = container_client.get_blob_client(blob_name)
-                click_bytes = blob_client.download_blob().readall()
-                df = pd.read_csv(BytesIO(click_bytes))
-                all_clicks.append(df)
-            except Exception as e:
-                logging.warning(f"Erreur lors du chargement de {blob_name}: {e}")
-        
-        if all_clicks:
-            _user_clicks = pd.concat(all_clicks, ignore_index=True)
-            logging.info(f"✓ {len(_user_clicks)} clicks chargés")
-        else:
-            _user_clicks = pd.DataFrame()
-            logging.warning("Aucun fichier de clicks chargé")
-        
+        async with BlobServiceClient.from_connection_string(connect_str) as blob_service_client:
+            container_client = blob_service_client.get_container_client("data")
+
+            async def _download(blob_name):
+                downloader = await container_client.get_blob_client(blob_name).download_blob()
+                return await downloader.readall()
+
+            # Chemin rapide: artefacts entièrement préparés (embeddings déjà
+            # normalisés, ids, historique, métadonnées) publiés lors d'un
+            # précédent démarrage ou par un job offline
+            prepared = await _load_prepared_artifacts(container_client)
+
+            if not prepared:
+                # 1+2. Charger embeddings et métadonnées (téléchargements
+                # concurrents: asyncio.gather recouvre les attentes réseau)
+                logging.info("Chargement des embeddings et métadonnées...")
+                embeddings_bytes, metadata_bytes = await asyncio.gather(
+                    _download("articles_embeddings.pickle"),
+                    _download("articles_metadata.csv"),
+                )
+                embeddings_data = pickle.loads(embeddings_bytes)
+
+                # Les embeddings sont un array numpy
+                # Normalisation L2 une seule fois: la similarité cosinus devient
+                # un simple produit scalaire
+                _embeddings = np.ascontiguousarray(embeddings_data, dtype=np.float32)
+                # sqrt(sum(x²)) via einsum: évite la validation et le sqrt
+                # intermédiaire de np.linalg.norm
+                norms = np.sqrt(np.einsum('ij,ij->i', _embeddings, _embeddings))
+                norms[norms == 0] = 1.0
+                _embeddings /= norms[:, None]
+
+                _articles_metadata = pd.read_csv(BytesIO(metadata_bytes))
+                # Index par article_id: lookup O(1) dans get_article_info au lieu
+                # d'un masque booléen sur tout le DataFrame
+                _meta_by_id = _articles_metadata.set_index('article_id', drop=False)
+
+                # Mapper les embeddings aux article_ids
+                _article_ids = _articles_metadata['article_id'].iloc[:len(_embeddings)].tolist()
+
+                # Table article_id -> index: lookup O(1) au lieu d'un parcours
+                # linéaire de la liste à chaque requête
+                _id_to_idx = {int(aid): i for i, aid in enumerate(_article_ids)}
+
+                _build_meta_arrays()
+
+                logging.info(f"✓ {len(_article_ids)} embeddings chargés")
+
+                # 3. Charger quelques fichiers de clicks
+                logging.info("Chargement des clicks...")
+
+                # Chemin rapide: un fichier Parquet consolidé (colonnaire,
+                # compressé, typé) évite de télécharger et parser les CSV un par un
+                all_clicks = []
+                try:
+                    parquet_blob = container_client.get_blob_client("clicks.parquet")
+                    if await parquet_blob.exists():
+                        all_clicks = [pd.read_parquet(BytesIO(await _download("clicks.parquet")))]
+                        logging.info("✓ Clicks chargés depuis clicks.parquet")
+                except Exception as e:
+                    logging.warning(f"Impossible de charger clicks.parquet: {e}")
+                    all_clicks = []
+
+                if not all_clicks:
+                    # Liste des blobs dans le dossier clicks/
+                    click_files = []
+                    async for blob in container_client.list_blobs(name_starts_with="clicks/"):
+                        if blob.name.endswith('.csv'):
+                            click_files.append(blob.name)
+
+                    if not click_files:
+                        # Si pas de dossier clicks/, chercher les fichiers à la racine
+                        async for blob in container_client.list_blobs():
+                            if 'clicks_hour' in blob.name:
+                                click_files.append(blob.name)
+
+                    click_files = click_files[:10]
+
+                    async def _download_click_file(blob_name):
+                        try:
+                            return _read_clicks_csv(await _download(blob_name))
+                        except Exception as e:
+                            logging.warning(f"Erreur lors du chargement de {blob_name}: {e}")
+                            return None
+
+                    # Téléchargements concurrents via asyncio.gather
+                    if click_files:
+                        dfs = await asyncio.gather(
+                            *[_download_click_file(name) for name in click_files]
+                        )
+                        all_clicks = [df for df in dfs if df is not None]
+
+                if all_clicks:
+                    _user_clicks = pd.concat(all_clicks, ignore_index=True)
+                    # Dtypes compacts: int32 suffit largement pour les IDs et
+                    # divise par deux la mémoire du DataFrame et la bande
+                    # passante du groupby
+                    _user_clicks = _user_clicks.astype(
+                        {'user_id': 'int32', 'click_article_id': 'int32'}
+                    )
+                    # Historique précalculé par utilisateur: évite de re-scanner
+                    # tous les clicks à chaque requête
+                    _history_by_user = (
+                        _user_clicks.groupby('user_id')['click_article_id']
+                        .apply(lambda s: s.unique())
+                        .to_dict()
+                    )
+                    logging.info(f"✓ {len(_user_clicks)} clicks chargés")
+                else:
+                    _user_clicks = pd.DataFrame()
+                    _history_by_user = {}
+                    logging.warning("Aucun fichier de clicks chargé")
+
+            # Construire ou recharger l'index FAISS HNSW (recherche approximative
+            # en O(log N), produit scalaire = cosinus sur vecteurs normalisés)
+            if faiss is not None:
+                _index = await _load_or_build_index(container_client)
+            else:
+                if _dot_scores is not None:
+                    # Compiler le noyau Numba maintenant plutôt qu'à la
+                    # première requête
+                    _dot_scores(_embeddings[:1], _embeddings[:1])
+                    logging.warning("FAISS non disponible, repli sur le noyau Numba")
+                else:
+                    logging.warning("FAISS non disponible, repli sur le produit scalaire numpy")
+
+            if not prepared and _history_by_user:
+                # Publier les artefacts préparés (embeddings encore en float32)
+                # pour accélérer les prochains cold starts. Historique vide
+                # (échec transitoire des clicks): ne rien publier, sinon tous
+                # les cold starts suivants prendraient le chemin rapide avec
+                # un historique définitivement vide
+                await _save_prepared_artifacts(container_client)
+
+        if _index is not None and not isinstance(_embeddings, np.memmap):
+            # L'index FAISS garde sa propre copie float32: le cache local
+            # ne sert plus qu'à fournir les vecteurs requêtes, on le
+            # quantifie en float16 pour diviser par deux sa mémoire
+            # (inutile s'il est mmappé: l'OS ne pagine que le nécessaire)
+            _embeddings = _embeddings.astype(np.float16)
+
+        # Invalider le cache de recommandations après un rechargement
+        _recommend_for_user_cached.cache_clear()
+
         logging.info("✓ Données chargées avec succès!")
-        
+
     except Exception as e:
         logging.error(f"Erreur lors du chargement des données: {e}")
         raise
 
 
+def _build_meta_arrays():
+    """
+    Colonnes métadonnées en tableaux NumPy alignés sur l'index des
+    embeddings: get_article_info devient des lectures de tableau au lieu
+    d'un lookup pandas avec boxing des valeurs.
+    """
+    global _category_by_idx, _words_count_by_idx
+
+    meta = _meta_by_id.reindex(_article_ids)
+    if 'category_id' in meta.columns:
+        _category_by_idx = meta['category_id'].fillna(0).to_numpy(dtype=np.int32)
+    if 'words_count' in meta.columns:
+        _words_count_by_idx = meta['words_count'].fillna(0).to_numpy(dtype=np.int32)
+
+
+# Artefacts préparés publiés dans Blob Storage pour accélérer les cold starts
+_PREPARED_BLOBS = ("embeddings.npy", "article_ids.npy", "history.pkl", "meta.parquet")
+
+
+async def _load_prepared_artifacts(container_client):
+    """
+    Recharge les artefacts entièrement préparés depuis Blob Storage
+    (dossier prepared/). Retourne True si tout a pu être chargé; sinon
+    le chemin de chargement complet reste nécessaire.
+    """
+    global _embeddings, _article_ids, _articles_metadata, _meta_by_id
+    global _history_by_user, _user_clicks, _id_to_idx
+
+    async def _fetch(name):
+        blob_client = container_client.get_blob_client(f"prepared/{name}")
+        if not await blob_client.exists():
+            return None
+        local_path = f"/tmp/{name}"
+        with open(local_path, "wb") as f:
+            downloader = await blob_client.download_blob()
+            await downloader.readinto(f)
+        return local_path
+
+    try:
+        # Les quatre artefacts se téléchargent en parallèle
+        paths = await asyncio.gather(*[_fetch(name) for name in _PREPARED_BLOBS])
+        if any(path is None for path in paths):
+            return False
+        local_paths = dict(zip(_PREPARED_BLOBS, paths))
+
+        # mmap: l'OS pagine les vecteurs à la demande au lieu de
+        # matérialiser toute la matrice en RAM
+        _embeddings = np.load(local_paths["embeddings.npy"], mmap_mode='r')
+        _article_ids = np.load(local_paths["article_ids.npy"]).tolist()
+        with open(local_paths["history.pkl"], "rb") as f:
+            _history_by_user = pickle.load(f)
+        if not _history_by_user:
+            # Artefact publié à partir d'un chargement de clicks raté:
+            # repasser par le chemin complet pour retenter
+            logging.warning("Historique préparé vide, rechargement complet")
+            return False
+        _articles_metadata = pd.read_parquet(local_paths["meta.parquet"])
+    except Exception as e:
+        logging.warning(f"Impossible de recharger les artefacts préparés: {e}")
+        return False
+
+    _meta_by_id = _articles_metadata.set_index('article_id', drop=False)
+    _id_to_idx = {int(aid): i for i, aid in enumerate(_article_ids)}
+    _build_meta_arrays()
+    _user_clicks = pd.DataFrame()
+
+    logging.info(f"✓ {len(_article_ids)} embeddings chargés depuis les artefacts préparés")
+    return True
+
+
+async def _save_prepared_artifacts(container_client):
+    """
+    Publie les artefacts préparés (embeddings normalisés, ids, historique,
+    métadonnées) dans Blob Storage pour les prochains cold starts.
+    """
+    async def _upload(name):
+        with open(f"/tmp/{name}", "rb") as f:
+            await container_client.get_blob_client(f"prepared/{name}").upload_blob(f, overwrite=True)
+
+    try:
+        np.save("/tmp/embeddings.npy", _embeddings)
+        np.save("/tmp/article_ids.npy", np.asarray(_article_ids, dtype=np.int64))
+        with open("/tmp/history.pkl", "wb") as f:
+            pickle.dump(_history_by_user, f, protocol=pickle.HIGHEST_PROTOCOL)
+        _articles_metadata.to_parquet("/tmp/meta.parquet")
+
+        await asyncio.gather(*[_upload(name) for name in _PREPARED_BLOBS])
+
+        logging.info("✓ Artefacts préparés publiés dans Blob Storage")
+    except Exception as e:
+        logging.warning(f"Impossible de publier les artefacts préparés: {e}")
+
+
+async def _load_or_build_index(container_client):
+    """
+    Recharge l'index HNSW depuis Blob Storage, ou le construit et le persiste.
+    Évite de reconstruire le graphe HNSW à chaque cold start.
+    """
+    index_blob = container_client.get_blob_client("hnsw.index")
+    local_path = "/tmp/hnsw.index"
+
+    try:
+        if await index_blob.exists():
+            with open(local_path, "wb") as f:
+                downloader = await index_blob.download_blob()
+                await downloader.readinto(f)
+            index = faiss.read_index(local_path)
+            index.hnsw.efSearch = 16
+            logging.info("✓ Index FAISS HNSW chargé depuis Blob Storage")
+            return index
+    except Exception as e:
+        logging.warning(f"Impossible de recharger l'index HNSW: {e}")
+
+    index = faiss.IndexHNSWFlat(_embeddings.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = 40
+    index.add(np.ascontiguousarray(_embeddings, dtype=np.float32))
+    index.hnsw.efSearch = 16
+    logging.info("✓ Index FAISS HNSW construit")
+
+    try:
+        faiss.write_index(index, local_path)
+        with open(local_path, "rb") as f:
+            await index_blob.upload_blob(f, overwrite=True)
+        logging.info("✓ Index HNSW persisté dans Blob Storage")
+    except Exception as e:
+        logging.warning(f"Impossible de persister l'index HNSW: {e}")
+
+    return index
+
+
 def get_user_history(user_id: int):
     """Récupère l'historique d'un utilisateur."""
-    if _user_clicks is None or len(_user_clicks) == 0:
+    if not _history_by_user:
         return []
-    
-    user_data = _user_clicks[_user_clicks['user_id'] == user_id]
-    if len(user_data) == 0:
+
+    history = _history_by_user.get(user_id)
+    if history is None:
         return []
-    
-    return user_data['click_article_id'].unique().tolist()
+
+    return history.tolist()
 
 
 def get_similar_articles(article_id: int, top_k: int = 10):
     """Trouve les articles similaires à un article donné."""
-    try:
-        article_idx = _article_ids.index(article_id)
-        article_embedding = _embeddings[article_idx].reshape(1, -1)
-        similarities = cosine_similarity(article_embedding, _embeddings)[0]
-        
-        similar_indices = np.argsort(similarities)[::-1][1:top_k+1]
-        results = [(int(_article_ids[idx]), float(similarities[idx])) for idx in similar_indices]
-        return results
-    except ValueError:
+    # Trouver l'index de l'article via la table précalculée
+    article_idx = _id_to_idx.get(article_id)
+    if article_idx is None:
         logging.warning(f"Article {article_id} non trouvé")
         return []
 
+    if _index is not None:
+        # FAISS renvoie directement le top-k via une sélection partielle
+        # (l'article lui-même arrive en tête, on le saute)
+        query = np.ascontiguousarray(_embeddings[article_idx:article_idx+1], dtype=np.float32)
+        distances, indices = _index.search(query, top_k + 1)
+        results = [
+            (int(_article_ids[idx]), float(score))
+            for idx, score in zip(indices[0], distances[0])
+            if idx != article_idx and idx != -1
+        ]
+        return results[:top_k]
+
+    # Repli sans FAISS: produit scalaire sur la matrice pré-normalisée
+    # (un seul gemv BLAS sur la vue contiguë, sans reshape ni copie)
+    if _dot_scores is not None:
+        similarities = _dot_scores(_embeddings[article_idx:article_idx+1], _embeddings)[0]
+    else:
+        similarities = _embeddings @ _embeddings[article_idx]
+
+    # Sélection partielle du top-k puis tri de ces k+1 éléments seulement:
+    # O(N + k log k) au lieu du tri complet O(N log N)
+    k = top_k + 1
+    if k >= len(similarities):
+        # Petit catalogue (argpartition exige k < N): tri complet,
+        # on renvoie simplement moins de résultats
+        similar_indices = np.argsort(-similarities)[1:k]
+    else:
+        part = np.argpartition(-similarities, k)[:k]
+        similar_indices = part[np.argsort(-similarities[part])][1:]
+    results = [(int(_article_ids[idx]), float(similarities[idx])) for idx in similar_indices]
+    return results
+
 
 def get_article_info(article_id: int):
     """Récupère les infos d'un article."""
-    article_row = _articles_metadata[_articles_metadata['article_id'] == article_id]
-    
-    if len(article_row) == 0:
+    idx = _id_to_idx.get(article_id)
+
+    if idx is None:
+        # Article hors de la plage des embeddings: repli sur l'index pandas
+        try:
+            article = _meta_by_id.loc[article_id]
+        except KeyError:
+            return {
+                'article_id': int(article_id),
+                'title': f'Article {article_id}',
+                'category': 'N/A',
+                'words_count': 0
+            }
+
         return {
             'article_id': int(article_id),
             'title': f'Article {article_id}',
-            'category': 'N/A',
-            'words_count': 0
+            'category': int(article.get('category_id', 0)),
+            'words_count': int(article.get('words_count', 0))
         }
-    
-    article = article_row.iloc[0]
+
+    # Chemin rapide: lectures directes dans les tableaux alignés
     return {
         'article_id': int(article_id),
         'title': f'Article {article_id}',
-        'category': int(article.get('category_id', 0)),
-        'words_count': int(article.get('words_count', 0))
+        'category': int(_category_by_idx[idx]) if _category_by_idx is not None else 0,
+        'words_count': int(_words_count_by_idx[idx]) if _words_count_by_idx is not None else 0
     }
 
 
-def recommend_for_user(user_id: int, top_n: int = 5):
-    """Génère des recommandations pour un utilisateur."""
+@functools.lru_cache(maxsize=10_000)
+def _recommend_for_user_cached(user_id: int, top_n: int):
+    """
+    Calcule les paires (article_id, score) pour un utilisateur.
+    Mis en cache par (user_id, top_n): les requêtes répétées pour un même
+    utilisateur deviennent un simple lookup. Vidé à chaque rechargement
+    des données.
+    """
     user_history = get_user_history(user_id)
-    
+
     if not user_history:
-        # Recommandations par défaut (articles populaires ou premiers articles)
+        # Recommandations par défaut (premiers articles)
         logging.info(f"Pas d'historique pour user {user_id}")
-        results = []
-        for i, article_id in enumerate(_article_ids[:top_n]):
-            article_info = get_article_info(article_id)
-            article_info['recommendation_score'] = float(top_n - i)
-            results.append(article_info)
-        return results
-    
-    # Calculer les recommandations basées sur la similarité
-    recommendations_scores = {}
-    
+        return tuple(
+            (int(article_id), float(top_n - i))
+            for i, article_id in enumerate(_article_ids[:top_n])
+        )
+
+    # Regrouper les articles lus en un seul batch de requêtes:
+    # une seule recherche (un seul matmul) au lieu d'une passe
+    # complète sur la matrice par article lu
+    history_idxs = []
     for article_id in user_history[:5]:
-        similar_articles = get_similar_articles(article_id, top_k=20)
-        
-        for recommended_id, score in similar_articles:
-            if recommended_id not in user_history:
-                if recommended_id not in recommendations_scores:
-                    recommendations_scores[recommended_id] = 0
-                recommendations_scores[recommended_id] += score
-    
-    sorted_recommendations = sorted(
-        recommendations_scores.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:top_n]
-    
+        idx = _id_to_idx.get(article_id)
+        if idx is None:
+            logging.warning(f"Article {article_id} non trouvé")
+        else:
+            history_idxs.append(idx)
+
+    sorted_recommendations = []
+
+    if history_idxs:
+        top_k = 20
+
+        if _index is not None:
+            queries = np.ascontiguousarray(_embeddings[history_idxs], dtype=np.float32)
+            distances, indices = _index.search(queries, top_k + 1)
+        else:
+            queries = _embeddings[history_idxs]
+            if _dot_scores is not None:
+                similarities = _dot_scores(queries, _embeddings)
+            else:
+                similarities = queries @ _embeddings.T
+            # Sélection partielle par ligne: l'agrégation qui suit ne
+            # dépend pas de l'ordre des k+1 voisins retenus
+            k = top_k + 1
+            if k >= similarities.shape[1]:
+                # Petit catalogue (argpartition exige k < N): tout garder
+                indices = np.argsort(-similarities, axis=1)
+            else:
+                indices = np.argpartition(-similarities, k, axis=1)[:, :k]
+            distances = np.take_along_axis(similarities, indices, axis=1)
+
+        # Agrégation vectorisée: bincount somme les scores par index
+        # d'article en C, sans dict Python ni double boucle
+        indices_flat = indices.ravel()
+        distances_flat = distances.ravel()
+        valid = indices_flat >= 0
+        indices_flat = indices_flat[valid]
+        distances_flat = distances_flat[valid]
+
+        n_articles = len(_article_ids)
+        scores = np.bincount(indices_flat, weights=distances_flat, minlength=n_articles)
+
+        # Candidats: articles apparus dans les voisins, moins ceux déjà lus
+        candidates_mask = np.zeros(n_articles, dtype=bool)
+        candidates_mask[indices_flat] = True
+        read_idxs = [
+            i for i in (_id_to_idx.get(aid) for aid in user_history)
+            if i is not None
+        ]
+        if read_idxs:
+            candidates_mask[read_idxs] = False
+        candidates = np.flatnonzero(candidates_mask)
+
+        # Top-n par sélection partielle puis tri de ces n éléments
+        n_take = min(top_n, len(candidates))
+        if n_take > 0:
+            cand_scores = scores[candidates]
+            part = np.argpartition(-cand_scores, n_take - 1)[:n_take]
+            order = part[np.argsort(-cand_scores[part])]
+            sorted_recommendations = [
+                (int(_article_ids[candidates[i]]), float(cand_scores[i]))
+                for i in order
+            ]
+
+    return tuple(sorted_recommendations)
+
+
+def recommend_for_user(user_id: int, top_n: int = 5):
+    """Génère des recommandations pour un utilisateur."""
+    # Enrichir les paires (article_id, score) mises en cache
     results = []
-    for article_id, score in sorted_recommendations:
+    for article_id, score in _recommend_for_user_cached(user_id, top_n):
         article_info = get_article_info(article_id)
         article_info['recommendation_score'] = float(score)
         results.append(article_info)
-    
+
     return results
 
 
 @app.route(route="recommend", methods=["GET"])
-def recommend(req: func.HttpRequest) -> func.HttpResponse:
+async def recommend(req: func.HttpRequest) -> func.HttpResponse:
     """
     Endpoint HTTP pour générer des recommandations.
     
@@ -206,26 +626,21 @@ def recommend(req: func.HttpRequest) -> func.HttpResponse:
     
     try:
         # Charger les données (utilise le cache si déjà chargé)
-        load_data_from_blob()
+        await load_data_from_blob()
         
         # Récupérer les paramètres
         user_id = req.params.get('user_id')
         top_n = req.params.get('top_n', '5')
         
         if not user_id:
-            return func.HttpResponse(
-                json.dumps({"error": "Paramètre 'user_id' manquant"}),
-                mimetype="application/json",
-                status_code=400
-            )
-        
+            return _json_response({"error": "Paramètre 'user_id' manquant"}, status_code=400)
+
         try:
             user_id = int(user_id)
             top_n = int(top_n)
         except ValueError:
-            return func.HttpResponse(
-                json.dumps({"error": "user_id et top_n doivent être des entiers"}),
-                mimetype="application/json",
+            return _json_response(
+                {"error": "user_id et top_n doivent être des entiers"},
                 status_code=400
             )
         
@@ -239,26 +654,14 @@ def recommend(req: func.HttpRequest) -> func.HttpResponse:
             "count": len(recommendations)
         }
         
-        return func.HttpResponse(
-            json.dumps(response, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=200
-        )
-    
+        return _json_response(response)
+
     except Exception as e:
         logging.error(f"Erreur: {e}")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            mimetype="application/json",
-            status_code=500
-        )
+        return _json_response({"error": str(e)}, status_code=500)
 
 
 @app.route(route="health", methods=["GET"])
 def health(req: func.HttpRequest) -> func.HttpResponse:
     """Endpoint de santé pour vérifier que la fonction est opérationnelle."""
-    return func.HttpResponse(
-        json.dumps({"status": "healthy", "service": "My Content Recommendation API"}),
-        mimetype="application/json",
-        status_code=200
-    )
\ No newline at end of file
+    return _json_response({"status": "healthy", "service": "My Content Recommendation API"})
\ No newline at end of file
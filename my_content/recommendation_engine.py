@@ -3,17 +3,68 @@ Système de recommandation content-based pour My Content MVP
 Utilise les embeddings d'articles pour recommander du contenu similaire
 """
 
+import functools
 import pickle
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from pathlib import Path
 from typing import List, Tuple, Dict
 import logging
 
+try:
+    import faiss
+except ImportError:
+    # FAISS est optionnel: sans lui on retombe sur un produit scalaire numpy
+    faiss = None
+
+try:
+    import numba
+except ImportError:
+    # Numba est un accélérateur optionnel du chemin de repli sans FAISS
+    numba = None
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _dot_scores(queries, embeddings):
+        """
+        Produit scalaire (n_requêtes, N) sur des embeddings pré-normalisés:
+        équivaut à la similarité cosinus sans re-normalisation.
+        """
+        n_queries, dim = queries.shape
+        n_articles = embeddings.shape[0]
+        out = np.empty((n_queries, n_articles), dtype=np.float32)
+        for q in range(n_queries):
+            for i in numba.prange(n_articles):
+                score = 0.0
+                for j in range(dim):
+                    score += queries[q, j] * embeddings[i, j]
+                out[q, i] = score
+        return out
+else:
+    _dot_scores = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Dtypes explicites des colonnes de clicks: évite la passe d'inférence
+# de types du parser CSV et produit directement des colonnes compactes
+_CLICK_DTYPES = {
+    'user_id': 'int32',
+    'click_article_id': 'int32',
+    'click_timestamp': 'int64',
+}
+
+
+def _read_clicks_csv(path):
+    """
+    Parse un fichier CSV de clicks avec dtypes explicites, via le parser
+    C++ parallèle de pyarrow quand il est disponible.
+    """
+    try:
+        return pd.read_csv(path, engine='pyarrow', dtype=_CLICK_DTYPES)
+    except (ImportError, TypeError, ValueError):
+        return pd.read_csv(path, dtype=_CLICK_DTYPES)
+
 
 class ContentRecommender:
     """
@@ -33,7 +84,21 @@ class ContentRecommender:
         self.articles_metadata = None
         self.user_clicks = None
         self.article_ids = None
+        self.index = None
+        self._article_id_to_idx = None
+        self._history_by_user = None
+        self._meta_by_id = None
+        self._popularity = None
+        self._title_by_idx = None
+        self._category_by_idx = None
+        self._words_count_by_idx = None
         
+        # Cache LRU par (user_id, top_n): les requêtes répétées pour un
+        # même utilisateur deviennent un simple lookup
+        self._recommend_cached = functools.lru_cache(maxsize=10_000)(
+            self._compute_recommendations
+        )
+
         logger.info("Initialisation du système de recommandation...")
         self._load_data()
     
@@ -42,38 +107,83 @@ class ContentRecommender:
         try:
             # 1. Charger les embeddings des articles
             logger.info("Chargement des embeddings...")
-            embeddings_path = self.data_path / "articles_embeddings.pickle"
-            with open(embeddings_path, 'rb') as f:
-                embeddings_data = pickle.load(f)
-            
-            # Gérer différents formats possibles du fichier pickle
-            if isinstance(embeddings_data, dict):
-                # Format: {article_id: embedding_vector}
-                self.article_ids = list(embeddings_data.keys())
-                self.embeddings = np.array([embeddings_data[aid] for aid in self.article_ids])
-            elif isinstance(embeddings_data, tuple) and len(embeddings_data) == 2:
-                # Format: (article_ids_list, embeddings_matrix)
-                self.article_ids = embeddings_data[0]
-                self.embeddings = embeddings_data[1]
-            elif isinstance(embeddings_data, np.ndarray):
-                # Format: seulement la matrice d'embeddings (sans IDs)
-                # Dans ce cas, on doit récupérer les IDs depuis les métadonnées
-                logger.warning("Embeddings sans IDs détectés, chargement des métadonnées d'abord...")
-                metadata_path = self.data_path / "articles_metadata.csv"
-                temp_metadata = pd.read_csv(metadata_path)
-                
-                # Prendre les N premiers articles (N = nombre de lignes dans embeddings)
-                self.article_ids = temp_metadata['article_id'].iloc[:len(embeddings_data)].tolist()
-                self.embeddings = embeddings_data
+            emb_npy_path = self.data_path / "articles_embeddings_norm.npy"
+            ids_npy_path = self.data_path / "article_ids.npy"
+
+            if emb_npy_path.exists() and ids_npy_path.exists():
+                # Chemin rapide: embeddings déjà normalisés, mmappés (l'OS
+                # pagine les vecteurs à la demande au lieu de matérialiser
+                # toute la matrice en RAM)
+                self.embeddings = np.load(emb_npy_path, mmap_mode='r')
+                self.article_ids = np.load(ids_npy_path).tolist()
             else:
-                raise ValueError(f"Format d'embeddings non reconnu: {type(embeddings_data)}")
-            
+                self._load_and_normalize_embeddings()
+
+                # Sauvegarder les artefacts normalisés pour mmapper les
+                # prochains démarrages sans reparser le pickle
+                try:
+                    np.save(emb_npy_path, self.embeddings)
+                    np.save(ids_npy_path, np.asarray(self.article_ids, dtype=np.int64))
+                except Exception as e:
+                    logger.warning(f"Impossible de sauvegarder les embeddings normalisés: {e}")
+
             logger.info(f"✓ {len(self.article_ids)} embeddings chargés (dimension: {self.embeddings.shape[1]})")
-            
+
+            # Table article_id -> index: lookup O(1) au lieu d'un parcours
+            # linéaire de la liste à chaque requête
+            self._article_id_to_idx = {int(aid): i for i, aid in enumerate(self.article_ids)}
+
+            # Construire l'index FAISS HNSW (recherche approximative en O(log N),
+            # produit scalaire = cosinus sur vecteurs normalisés)
+            if faiss is not None:
+                index_path = self.data_path / "hnsw.index"
+                if index_path.exists():
+                    self.index = faiss.read_index(str(index_path))
+                    logger.info("✓ Index FAISS HNSW chargé depuis le disque")
+                else:
+                    self.index = faiss.IndexHNSWFlat(
+                        self.embeddings.shape[1], 32, faiss.METRIC_INNER_PRODUCT
+                    )
+                    self.index.hnsw.efConstruction = 40
+                    self.index.add(np.ascontiguousarray(self.embeddings, dtype=np.float32))
+                    faiss.write_index(self.index, str(index_path))
+                    logger.info("✓ Index FAISS HNSW construit et sauvegardé")
+                self.index.hnsw.efSearch = 16
+
+                # L'index FAISS garde sa propre copie float32: le cache local
+                # ne sert plus qu'à fournir les vecteurs requêtes, on le
+                # quantifie en float16 pour diviser par deux sa mémoire
+                # (inutile s'il est mmappé: l'OS ne pagine que le nécessaire)
+                if not isinstance(self.embeddings, np.memmap):
+                    self.embeddings = self.embeddings.astype(np.float16)
+            else:
+                if _dot_scores is not None:
+                    # Compiler le noyau Numba maintenant plutôt qu'à la
+                    # première requête
+                    _dot_scores(self.embeddings[:1], self.embeddings[:1])
+                    logger.warning("FAISS non disponible, repli sur le noyau Numba")
+                else:
+                    logger.warning("FAISS non disponible, repli sur le produit scalaire numpy")
+
             # 2. Charger les métadonnées des articles
             logger.info("Chargement des métadonnées...")
             metadata_path = self.data_path / "articles_metadata.csv"
             self.articles_metadata = pd.read_csv(metadata_path)
+            # Index par article_id: lookup O(1) dans _get_article_info au lieu
+            # d'un masque booléen sur tout le DataFrame
+            self._meta_by_id = self.articles_metadata.set_index('article_id', drop=False)
+
+            # Colonnes métadonnées en tableaux NumPy alignés sur l'index des
+            # embeddings: _get_article_info devient 3 lectures de tableau au
+            # lieu d'un lookup pandas avec boxing des valeurs
+            meta = self._meta_by_id.reindex(self.article_ids)
+            if 'title' in meta.columns:
+                self._title_by_idx = meta['title'].to_numpy(dtype=object)
+            if 'category_id' in meta.columns:
+                self._category_by_idx = meta['category_id'].fillna(-1).to_numpy(dtype=np.int32)
+            if 'words_count' in meta.columns:
+                self._words_count_by_idx = meta['words_count'].fillna(0).to_numpy(dtype=np.int32)
+
             logger.info(f"✓ {len(self.articles_metadata)} articles chargés")
             
             # 3. Charger les clicks (on prend seulement quelques fichiers pour le MVP)
@@ -85,22 +195,75 @@ class ContentRecommender:
         except Exception as e:
             logger.error(f"Erreur lors du chargement des données: {e}")
             raise
-    
+
+    def _load_and_normalize_embeddings(self):
+        """
+        Charge les embeddings depuis le pickle source et les normalise (L2):
+        la similarité cosinus devient alors un simple produit scalaire.
+        """
+        embeddings_path = self.data_path / "articles_embeddings.pickle"
+        with open(embeddings_path, 'rb') as f:
+            embeddings_data = pickle.load(f)
+
+        # Gérer différents formats possibles du fichier pickle
+        if isinstance(embeddings_data, dict):
+            # Format: {article_id: embedding_vector}
+            self.article_ids = list(embeddings_data.keys())
+            self.embeddings = np.array([embeddings_data[aid] for aid in self.article_ids])
+        elif isinstance(embeddings_data, tuple) and len(embeddings_data) == 2:
+            # Format: (article_ids_list, embeddings_matrix)
+            self.article_ids = embeddings_data[0]
+            self.embeddings = embeddings_data[1]
+        elif isinstance(embeddings_data, np.ndarray):
+            # Format: seulement la matrice d'embeddings (sans IDs)
+            # Dans ce cas, on doit récupérer les IDs depuis les métadonnées
+            logger.warning("Embeddings sans IDs détectés, chargement des métadonnées d'abord...")
+            metadata_path = self.data_path / "articles_metadata.csv"
+            temp_metadata = pd.read_csv(metadata_path)
+
+            # Prendre les N premiers articles (N = nombre de lignes dans embeddings)
+            self.article_ids = temp_metadata['article_id'].iloc[:len(embeddings_data)].tolist()
+            self.embeddings = embeddings_data
+        else:
+            raise ValueError(f"Format d'embeddings non reconnu: {type(embeddings_data)}")
+
+        # Normaliser une seule fois
+        self.embeddings = np.ascontiguousarray(self.embeddings, dtype=np.float32)
+        # sqrt(sum(x²)) via einsum: évite la validation et le sqrt
+        # intermédiaire de np.linalg.norm
+        norms = np.sqrt(np.einsum('ij,ij->i', self.embeddings, self.embeddings))
+        norms[norms == 0] = 1.0
+        self.embeddings /= norms[:, None]
+
     def _load_clicks(self):
         """
         Charge les fichiers de clicks et construit l'historique utilisateur.
         Pour le MVP, on charge seulement les premiers fichiers.
         """
+        self._history_by_user = {}
+
+        # Chemin rapide: un fichier Parquet consolidé (colonnaire, compressé,
+        # typé) évite de parser les CSV un par un
+        parquet_path = self.data_path / "clicks.parquet"
+        if parquet_path.exists():
+            try:
+                self.user_clicks = pd.read_parquet(parquet_path)
+                logger.info(f"✓ {len(self.user_clicks)} clicks chargés depuis clicks.parquet")
+                self._build_click_indexes()
+                return
+            except Exception as e:
+                logger.warning(f"Impossible de charger {parquet_path}: {e}")
+
         clicks_folder = self.data_path / "clicks"
-        
+
         # Vérifier si le dossier existe
         if not clicks_folder.exists():
             logger.warning(f"Dossier clicks non trouvé: {clicks_folder}")
             self.user_clicks = pd.DataFrame()
             return
-        
+
         click_files = sorted(list(clicks_folder.glob("*.csv")))[:10]  # Limiter à 10 fichiers pour le MVP
-        
+
         if len(click_files) == 0:
             logger.warning(f"Aucun fichier CSV trouvé dans {clicks_folder}")
             self.user_clicks = pd.DataFrame()
@@ -109,7 +272,7 @@ class ContentRecommender:
         all_clicks = []
         for file in click_files:
             try:
-                df = pd.read_csv(file)
+                df = _read_clicks_csv(file)
                 all_clicks.append(df)
             except Exception as e:
                 logger.warning(f"Erreur lors du chargement de {file}: {e}")
@@ -120,6 +283,26 @@ class ContentRecommender:
         else:
             self.user_clicks = pd.concat(all_clicks, ignore_index=True)
             logger.info(f"✓ {len(self.user_clicks)} clicks chargés de {len(click_files)} fichiers")
+            self._build_click_indexes()
+
+    def _build_click_indexes(self):
+        """
+        Construit les index dérivés des clicks: historique par utilisateur
+        et popularité des articles, pour éviter de re-scanner tous les
+        clicks à chaque requête.
+        """
+        # Dtypes compacts: int32 suffit largement pour les IDs et divise
+        # par deux la mémoire du DataFrame et la bande passante du groupby
+        self.user_clicks = self.user_clicks.astype(
+            {'user_id': 'int32', 'click_article_id': 'int32'}
+        )
+
+        self._history_by_user = (
+            self.user_clicks.groupby('user_id')['click_article_id']
+            .apply(lambda s: s.unique())
+            .to_dict()
+        )
+        self._popularity = self.user_clicks['click_article_id'].value_counts()
     
     def get_user_history(self, user_id: int) -> List[int]:
         """
@@ -131,16 +314,16 @@ class ContentRecommender:
         Returns:
             Liste des article_ids lus par l'utilisateur
         """
-        if self.user_clicks is None or len(self.user_clicks) == 0:
+        if not self._history_by_user:
             return []
-        
-        user_data = self.user_clicks[self.user_clicks['user_id'] == user_id]
-        
-        if len(user_data) == 0:
+
+        history = self._history_by_user.get(user_id)
+
+        if history is None:
             logger.warning(f"Aucun historique trouvé pour l'utilisateur {user_id}")
             return []
-        
-        return user_data['click_article_id'].unique().tolist()
+
+        return history.tolist()
     
     def get_similar_articles(self, article_id: int, top_k: int = 10) -> List[Tuple[int, float]]:
         """
@@ -153,24 +336,49 @@ class ContentRecommender:
         Returns:
             Liste de tuples (article_id, score_similarité)
         """
-        try:
-            # Trouver l'index de l'article dans notre liste
-            article_idx = self.article_ids.index(article_id)
-            
-            # Calculer la similarité cosinus avec tous les autres articles
-            article_embedding = self.embeddings[article_idx].reshape(1, -1)
-            similarities = cosine_similarity(article_embedding, self.embeddings)[0]
-            
-            # Trier par similarité décroissante (en excluant l'article lui-même)
-            similar_indices = np.argsort(similarities)[::-1][1:top_k+1]
-            
-            # Retourner les IDs et scores
-            results = [(self.article_ids[idx], similarities[idx]) for idx in similar_indices]
-            return results
-            
-        except ValueError:
+        # Trouver l'index de l'article via la table précalculée
+        article_idx = self._article_id_to_idx.get(article_id)
+        if article_idx is None:
             logger.warning(f"Article {article_id} non trouvé dans les embeddings")
             return []
+
+        if self.index is not None:
+            # FAISS renvoie directement le top-k via une sélection partielle
+            # (l'article lui-même arrive en tête, on le saute)
+            query = np.ascontiguousarray(
+                self.embeddings[article_idx:article_idx + 1], dtype=np.float32
+            )
+            distances, indices = self.index.search(query, top_k + 1)
+            results = [
+                (int(self.article_ids[idx]), float(score))
+                for idx, score in zip(indices[0], distances[0])
+                if idx != article_idx and idx != -1
+            ]
+            return results[:top_k]
+
+        # Repli sans FAISS: produit scalaire sur la matrice pré-normalisée
+        # (un seul gemv BLAS sur la vue contiguë, sans reshape ni copie)
+        if _dot_scores is not None:
+            similarities = _dot_scores(
+                self.embeddings[article_idx:article_idx + 1], self.embeddings
+            )[0]
+        else:
+            similarities = self.embeddings @ self.embeddings[article_idx]
+
+        # Sélection partielle du top-k puis tri de ces k+1 éléments seulement:
+        # O(N + k log k) au lieu du tri complet O(N log N)
+        k = top_k + 1
+        if k >= len(similarities):
+            # Petit catalogue (argpartition exige k < N): tri complet,
+            # on renvoie simplement moins de résultats
+            similar_indices = np.argsort(-similarities)[1:k]
+        else:
+            part = np.argpartition(-similarities, k)[:k]
+            similar_indices = part[np.argsort(-similarities[part])][1:]
+
+        # Retourner les IDs et scores
+        results = [(self.article_ids[idx], similarities[idx]) for idx in similar_indices]
+        return results
     
     def recommend_for_user(self, user_id: int, top_n: int = 5) -> List[Dict]:
         """
@@ -189,68 +397,157 @@ class ContentRecommender:
         Returns:
             Liste de dictionnaires contenant les recommandations
         """
+        # Enrichir les paires (article_id, score) mises en cache
+        results = []
+        for article_id, score in self._recommend_cached(user_id, top_n):
+            article_info = self._get_article_info(article_id)
+            article_info['recommendation_score'] = float(score)
+            results.append(article_info)
+
+        return results
+
+    def _compute_recommendations(self, user_id: int, top_n: int) -> Tuple[Tuple[int, float], ...]:
+        """
+        Calcule les paires (article_id, score) pour un utilisateur.
+        Appelé via le cache LRU construit dans __init__.
+        """
         # Récupérer l'historique utilisateur
         user_history = self.get_user_history(user_id)
-        
+
         if not user_history:
             # Si pas d'historique, recommander les articles les plus populaires
             logger.info(f"Pas d'historique pour user {user_id}, recommandations par défaut")
-            return self._get_popular_articles(top_n)
-        
-        # Collecter les articles similaires pour chaque article lu
-        recommendations_scores = {}
-        
+            return tuple(
+                (rec['article_id'], rec['recommendation_score'])
+                for rec in self._get_popular_articles(top_n)
+            )
+
+        # Regrouper les articles lus en un seul batch de requêtes:
+        # une seule recherche (un seul matmul) au lieu d'une passe
+        # complète sur la matrice par article lu
+        history_idxs = []
         for article_id in user_history[:5]:  # Limiter à 5 articles les plus récents
-            similar_articles = self.get_similar_articles(article_id, top_k=20)
-            
-            for recommended_id, score in similar_articles:
-                # Ne pas recommander des articles déjà lus
-                if recommended_id not in user_history:
-                    if recommended_id not in recommendations_scores:
-                        recommendations_scores[recommended_id] = 0
-                    recommendations_scores[recommended_id] += score
-        
-        # Trier par score décroissant
-        sorted_recommendations = sorted(
-            recommendations_scores.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:top_n]
-        
-        # Enrichir avec les métadonnées
-        results = []
-        for article_id, score in sorted_recommendations:
-            article_info = self._get_article_info(article_id)
-            article_info['recommendation_score'] = float(score)
-            results.append(article_info)
-        
-        return results
-    
+            idx = self._article_id_to_idx.get(article_id)
+            if idx is None:
+                logger.warning(f"Article {article_id} non trouvé dans les embeddings")
+            else:
+                history_idxs.append(idx)
+
+        sorted_recommendations = []
+
+        if history_idxs:
+            top_k = 20
+
+            if self.index is not None:
+                queries = np.ascontiguousarray(
+                    self.embeddings[history_idxs], dtype=np.float32
+                )
+                distances, indices = self.index.search(queries, top_k + 1)
+            else:
+                queries = self.embeddings[history_idxs]
+                if _dot_scores is not None:
+                    similarities = _dot_scores(queries, self.embeddings)
+                else:
+                    similarities = queries @ self.embeddings.T
+                # Sélection partielle par ligne: l'agrégation qui suit ne
+                # dépend pas de l'ordre des k+1 voisins retenus
+                k = top_k + 1
+                if k >= similarities.shape[1]:
+                    # Petit catalogue (argpartition exige k < N): tout garder
+                    indices = np.argsort(-similarities, axis=1)
+                else:
+                    indices = np.argpartition(-similarities, k, axis=1)[:, :k]
+                distances = np.take_along_axis(similarities, indices, axis=1)
+
+            # Agrégation vectorisée: bincount somme les scores par index
+            # d'article en C, sans dict Python ni double boucle
+            indices_flat = indices.ravel()
+            distances_flat = distances.ravel()
+            valid = indices_flat >= 0
+            indices_flat = indices_flat[valid]
+            distances_flat = distances_flat[valid]
+
+            n_articles = len(self.article_ids)
+            scores = np.bincount(
+                indices_flat, weights=distances_flat, minlength=n_articles
+            )
+
+            # Candidats: articles apparus dans les voisins, moins ceux déjà lus
+            candidates_mask = np.zeros(n_articles, dtype=bool)
+            candidates_mask[indices_flat] = True
+            read_idxs = [
+                i for i in (self._article_id_to_idx.get(aid) for aid in user_history)
+                if i is not None
+            ]
+            if read_idxs:
+                candidates_mask[read_idxs] = False
+            candidates = np.flatnonzero(candidates_mask)
+
+            # Top-n par sélection partielle puis tri de ces n éléments
+            n_take = min(top_n, len(candidates))
+            if n_take > 0:
+                cand_scores = scores[candidates]
+                part = np.argpartition(-cand_scores, n_take - 1)[:n_take]
+                order = part[np.argsort(-cand_scores[part])]
+                sorted_recommendations = [
+                    (int(self.article_ids[candidates[i]]), float(cand_scores[i]))
+                    for i in order
+                ]
+
+        return tuple(sorted_recommendations)
+
     def _get_article_info(self, article_id: int) -> Dict:
         """Récupère les informations d'un article depuis les métadonnées."""
-        article_row = self.articles_metadata[
-            self.articles_metadata['article_id'] == article_id
-        ]
-        
-        if len(article_row) == 0:
+        idx = self._article_id_to_idx.get(article_id)
+
+        if idx is None:
+            # Article hors de la plage des embeddings: repli sur l'index pandas
+            try:
+                article = self._meta_by_id.loc[article_id]
+            except KeyError:
+                return {
+                    'article_id': article_id,
+                    'title': f'Article {article_id}',
+                    'category': 'N/A',
+                    'words_count': 0
+                }
+
+            # Si pas de titre, utiliser l'ID de l'article
+            title = article.get('title', f'Article {article_id}')
+            if pd.isna(title) or title == '':
+                title = f'Article {article_id}'
+
+            # Types Python natifs uniquement: le résultat doit être
+            # sérialisable en JSON sans conversion en aval
+            category = article.get('category_id')
+            category = 'N/A' if category is None or pd.isna(category) else int(category)
+
             return {
-                'article_id': article_id,
-                'title': f'Article {article_id}',
-                'category': 'N/A',
-                'words_count': 0
+                'article_id': int(article_id),
+                'title': str(title),
+                'category': category,
+                'words_count': int(article.get('words_count', 0))
             }
-        
-        article = article_row.iloc[0]
-        # Si pas de titre, utiliser l'ID de l'article
-        title = article.get('title', f'Article {article_id}')
-        if pd.isna(title) or title == '':
+
+        # Chemin rapide: lectures directes dans les tableaux alignés
+        title = self._title_by_idx[idx] if self._title_by_idx is not None else None
+        if title is None or pd.isna(title) or title == '':
             title = f'Article {article_id}'
-            
+
+        category = (
+            int(self._category_by_idx[idx])
+            if self._category_by_idx is not None else 'N/A'
+        )
+        words_count = (
+            int(self._words_count_by_idx[idx])
+            if self._words_count_by_idx is not None else 0
+        )
+
         return {
             'article_id': int(article_id),
-            'title': title,
-            'category': article.get('category_id', 'N/A'),
-            'words_count': int(article.get('words_count', 0))
+            'title': str(title),
+            'category': category,
+            'words_count': words_count
         }
     
     def _get_popular_articles(self, top_n: int = 5) -> List[Dict]:
@@ -272,8 +569,8 @@ class ContentRecommender:
                 })
             return results
         
-        # Compter les clicks par article
-        article_popularity = self.user_clicks['click_article_id'].value_counts().head(top_n)
+        # Popularité précalculée au chargement des clicks
+        article_popularity = self._popularity.head(top_n)
         
         results = []
         for article_id, count in article_popularity.items():
@@ -137,25 +137,10 @@ def main():
                 
                 # Bouton de téléchargement des résultats
                 import json
-                import numpy as np
-                
-                # Convertir les types numpy en types Python natifs pour JSON
-                def convert_to_json_serializable(obj):
-                    if isinstance(obj, (np.integer, np.int64)):
-                        return int(obj)
-                    elif isinstance(obj, (np.floating, np.float64)):
-                        return float(obj)
-                    elif isinstance(obj, np.ndarray):
-                        return obj.tolist()
-                    return obj
-                
-                # Nettoyer les recommandations pour JSON
-                json_recommendations = []
-                for rec in recommendations:
-                    json_rec = {k: convert_to_json_serializable(v) for k, v in rec.items()}
-                    json_recommendations.append(json_rec)
-                
-                results_json = json.dumps(json_recommendations, indent=2, ensure_ascii=False)
+
+                # Le moteur ne renvoie que des types Python natifs:
+                # sérialisation directe, sans passe de conversion
+                results_json = json.dumps(recommendations, indent=2, ensure_ascii=False)
                 st.download_button(
                     label="📥 Télécharger les résultats (JSON)",
                     data=results_json,